@@ -4,18 +4,26 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
 import json
 import logging
 import sys
 import zipfile
+from collections import defaultdict
 from pathlib import Path
 from typing import Any
 from typing import Dict
+from typing import Generator
+from typing import IO
 from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import TYPE_CHECKING
 from typing import Tuple
+from typing import Union
+
+import graphviz
 
 from wildermyth_renderer import CharacterData
 from wildermyth_renderer import FilterParams
@@ -23,7 +31,13 @@ from wildermyth_renderer import GraphRenderer
 from wildermyth_renderer import RelationshipChart
 from wildermyth_renderer import RelationshipStatus
 from wildermyth_renderer import RendererParams
-from wildermyth_renderer import extract_individual_entities
+from wildermyth_renderer import iter_individual_entities
+
+try:
+    import ijson
+except ImportError:
+    # optional dependency; without it the whole legacy file is loaded into memory at once
+    ijson = None
 
 if TYPE_CHECKING:
     from wildermyth_renderer import schemas
@@ -60,6 +74,9 @@ rgroup.add_argument('-P', '--pack', action='store_true',
 rgroup.add_argument('--pack-by-subgraphs', action='store_true',
                     help='Flag to spread out different components when packing the chart')
 rgroup.add_argument('-L', '--include-legend', action='store_true', help='Flag to include legend to the chart')
+rgroup.add_argument('--engine', choices=sorted(graphviz.ENGINES), default=None,
+                    help='Graphviz layout engine to use for the chart '
+                         '(by default dot is used for smaller charts and sfdp for larger ones)')
 
 fgroup = parser.add_argument_group(title='Chart filtering params')
 fgroup.add_argument('--include-relationships', nargs='+', default=None,
@@ -73,7 +90,8 @@ fgroup.add_argument('--exclude-heroes', nargs='+', default=None,
                     help='List of heroes to exclude; accepts either name or id (short/long form)')
 
 
-def load_legacy_json(legacy_path: Path) -> schemas.LegacyDict:
+@contextlib.contextmanager
+def open_legacy_file(legacy_path: Path) -> Iterator[IO[bytes]]:
     if legacy_path.suffix.lower() == '.zip':
         with zipfile.ZipFile(legacy_path) as legacy_zip:
             legacy_json_filenames = [f for f in legacy_zip.namelist() if f.lower().endswith('.json')]
@@ -88,50 +106,75 @@ def load_legacy_json(legacy_path: Path) -> schemas.LegacyDict:
                 legacy_json_filename = legacy_json_filenames[0]
 
             with legacy_zip.open(legacy_json_filename) as legacy_file:
-                return json.load(legacy_file)
+                yield legacy_file
     elif legacy_path.suffix.lower() == '.json':
-        with legacy_path.open() as legacy_file:
-            return json.load(legacy_file)
+        with legacy_path.open('rb') as legacy_file:
+            yield legacy_file
     else:
         raise ValueError(f"Path to legacy file must be either .zip or .json")
 
 
-def prepare_relationship_list(rel_args: Optional[Iterable[str]]) -> Optional[List[Tuple[RelationshipStatus, str]]]:
+def iter_legacy_entries(legacy_path: Path) -> Generator[schemas.EntryDict, None, None]:
+    with open_legacy_file(legacy_path) as legacy_file:
+        if ijson is None:
+            yield from json.load(legacy_file)['entries']
+        else:
+            # parse entries one by one instead of building the whole legacy dictionary at once
+            yield from ijson.items(legacy_file, 'entries.item', use_float=True)
+
+
+RELATIONSHIP_STATUS_ALIASES = {
+    **{rel_status.name.lower(): rel_status for rel_status in RelationshipStatus},
+    # common mistake
+    'legacy': RelationshipStatus.LOCKED,
+}
+
+RELATIONSHIP_TYPE_ALIASES = {
+    # locked lovers are called soulmates in game, it may cause confusion
+    'soulmate': 'lover',
+    'soulmates': 'lover',
+    # in game files all the relationships are in singular form
+    'lovers': 'lover',
+    'rivals': 'rival',
+    'friends': 'friend',
+}
+
+
+def prepare_relationship_list(
+        rel_args: Optional[Iterable[Union[str, Tuple[RelationshipStatus, str]]]],
+) -> Optional[List[Tuple[RelationshipStatus, str]]]:
     if rel_args is None:
         return None
     res = []
-    for rel_str in rel_args:
-        rel_status, has_type, rel_type = rel_str.partition('_')
-        if rel_status == 'legacy':
-            # common mistake
-            rel_status = 'locked'
-        rel_status = RelationshipStatus[rel_status.upper()]
+    for rel_arg in rel_args:
+        if isinstance(rel_arg, tuple):
+            # already parsed
+            res.append(rel_arg)
+            continue
+        rel_status, has_type, rel_type = rel_arg.partition('_')
+        rel_status = RELATIONSHIP_STATUS_ALIASES[rel_status.lower()]
         if has_type:
-            if rel_type in ('soulmate', 'soulmates'):
-                # locked lovers are called soulmates in game, it may cause confusion
-                rel_type = 'lover'
-            elif rel_type in ('lovers', 'rivals', 'friends'):
-                # in game files all the relationships are in singular form
-                rel_type = rel_type[:-1]
+            rel_type = RELATIONSHIP_TYPE_ALIASES.get(rel_type, rel_type)
         else:
             rel_type = '*'
         res.append((rel_status, rel_type))
     return res
 
 
-def prepare_hero_list(hero_args: Optional[Iterable[str]], chart: RelationshipChart) -> Optional[List[str]]:
+def prepare_hero_list(hero_args: Optional[Iterable[str]],
+                      id_lookup: Dict[str, CharacterData],
+                      short_id_lookup: Dict[str, CharacterData],
+                      name_lookup: Dict[str, List[CharacterData]]) -> Optional[List[str]]:
     if hero_args is None:
         return None
     res = []
-    label_lookup = chart.make_label_lookup()
-    short_id_lookup = chart.make_short_id_lookup()
     for hero_str in hero_args:
-        if hero_str in chart.nodes:
+        if hero_str in id_lookup:
             res.append(hero_str)
         elif hero_str in short_id_lookup:
             res.append(short_id_lookup[hero_str].id)
-        elif hero_str in label_lookup:
-            res.extend([n.id for n in label_lookup[hero_str]])
+        elif hero_str in name_lookup:
+            res.extend([c.id for c in name_lookup[hero_str]])
         else:
             raise ValueError(f"Hero identifier {hero_str} not found")
     return res
@@ -140,25 +183,41 @@ def prepare_hero_list(hero_args: Optional[Iterable[str]], chart: RelationshipCha
 def main(args_dict: Dict[str, Any]) -> None:
     log.info('Starting program')
 
-    legacy_data = load_legacy_json(args_dict['legacy_path'])
-    individual_entities = extract_individual_entities(legacy_data)
+    individual_entities = iter_individual_entities(iter_legacy_entries(args_dict['legacy_path']))
     characters = [CharacterData.from_entity_dicts(*entity) for entity in individual_entities]
-    chart = RelationshipChart.from_character_data(characters)
+
+    # heroes are looked up before creating the chart, so that excluded ones never get into it in the first place
+    id_lookup = {c.id: c for c in characters}
+    short_id_lookup = {c.short_id: c for c in characters}
+    name_lookup = defaultdict(list)
+    for character in characters:
+        name_lookup[character.name].append(character)
+
+    include_heroes = prepare_hero_list(args_dict['include_heroes'], id_lookup, short_id_lookup, name_lookup)
+    exclude_heroes = prepare_hero_list(args_dict['exclude_heroes'], id_lookup, short_id_lookup, name_lookup)
+    if exclude_heroes is not None:
+        exclude_heroes = set(exclude_heroes)
+        if include_heroes is not None:
+            include_heroes = [hero_id for hero_id in include_heroes if hero_id not in exclude_heroes]
+
+    chart = RelationshipChart.from_character_data(
+        characters,
+        keep=(lambda character_id: character_id not in exclude_heroes) if exclude_heroes is not None else None,
+    )
 
     filter_params = FilterParams(
         include_relationships=prepare_relationship_list(args_dict['include_relationships']),
         exclude_relationships=prepare_relationship_list(args_dict['exclude_relationships']),
 
-        include_heroes=prepare_hero_list(args_dict['include_heroes'], chart),
-        exclude_heroes=prepare_hero_list(args_dict['exclude_heroes'], chart),
+        include_heroes=include_heroes,
     )
     chart.apply_filter_params(filter_params, inplace=True)
     chart.clean_relationships(inplace=True)
 
     renderer_params = RendererParams(
-        output_path=args_dict['output_path'].absolute(),
+        output_path=args_dict['output_path'],
         norender=args_dict['norender'],
-        render_dir=args_dict['render_dir'].absolute() if args_dict['render_dir'] is not None else None,
+        render_dir=args_dict['render_dir'],
         clean_tmp_files=args_dict['clean_tmp_files'],
         gender_shapes=not args_dict['no_gender_shapes'],
         class_colors=not args_dict['no_class_colors'],
@@ -167,6 +226,7 @@ def main(args_dict: Dict[str, Any]) -> None:
         hide_phantoms=args_dict['hide_phantoms'],
         pack_graph=args_dict['pack'],
         pack_by_subgraphs=args_dict['pack_by_subgraphs'],
+        engine=args_dict['engine'],
     )
     renderer = GraphRenderer(renderer_params, chart)
     renderer.render()
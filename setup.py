@@ -23,6 +23,10 @@ setuptools.setup(
     author="KaulleN",
     maintainer="KaulleN",
     packages=setuptools.find_packages(),
-    python_requires='>=3.8',
+    python_requires='>=3.10',
     install_requires=requirements,
+    extras_require={
+        # incremental parsing of legacy files, used by run.py when available
+        'streaming': ['ijson'],
+    },
 )
@@ -7,4 +7,5 @@ from .params import FilterParams
 from .params import RelationshipStatus
 from .params import RendererParams
 from .parse_legacy import extract_individual_entities
+from .parse_legacy import iter_individual_entities
 from .relationship_chart import RelationshipChart
@@ -5,8 +5,11 @@ from __future__ import annotations
 import dataclasses
 import enum
 import logging
-from functools import cached_property
+import sys
+from collections import defaultdict
+from typing import Dict
 from typing import Generator
+from typing import Iterable
 from typing import List
 from typing import Optional
 from typing import TYPE_CHECKING
@@ -37,7 +40,7 @@ class CharacterClass(enum.Enum):
 _CharacterAspect_T = TypeVar('_CharacterAspect_T', bound='CharacterAspect')
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class CharacterAspect:
     """
     Information about a single character aspect
@@ -62,18 +65,21 @@ class CharacterAspect:
         :param kwargs: extra kwargs passed directly to created aspect
         :return: created CharacterAspect instance
         """
-        aspect_data = cls._normalize_aspect_data(aspect_data)
+        aspect_str, value = cls._normalize_aspect_data(aspect_data)
 
-        title, has_data, data_str = aspect_data['aspect'].partition('|')
-        data = tuple(data_str.split('|')) if has_data else ()
+        title, has_data, data_str = aspect_str.partition('|')
+        # the same few titles repeat across all characters and are used for dispatch and lookups
+        title = sys.intern(title)
+        # aspect data mostly consists of character ids used as keys later on, so they're interned just like ids
+        data = tuple(map(sys.intern, data_str.split('|'))) if has_data else ()
 
-        if aspect_data.get('value') is not None:
-            kwargs['value'] = aspect_data['value']
+        if value is not None:
+            kwargs['value'] = value
 
         return cls(title=title, data=data, **kwargs)
 
     @classmethod
-    def _normalize_aspect_data(cls, aspect_data: Tuple) -> schemas.SingleAspectDict:
+    def _normalize_aspect_data(cls, aspect_data: Tuple) -> Tuple[str, Optional[float]]:
         if len(aspect_data) < 2:
             value = None
         elif isinstance(aspect_data[1], (int, float)) or aspect_data[1] is None:
@@ -83,16 +89,13 @@ class CharacterAspect:
         else:
             raise TypeError(aspect_data[1])
 
-        return {
-            'aspect': aspect_data[0],
-            'value': value,
-        }
+        return aspect_data[0], value
 
 
 _CharacterData_T = TypeVar('_CharacterData_T', bound='CharacterData')
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class CharacterData:
     """
     Information about a single character
@@ -103,23 +106,29 @@ class CharacterData:
     name: str
     aspects: List[CharacterAspect]
 
-    @cached_property
-    def short_id(self) -> str:
-        return self.id.split('-', 1)[0]
+    short_id: str = dataclasses.field(init=False, repr=False, compare=False)
+    gender: CharacterGender = dataclasses.field(init=False, repr=False, compare=False)
+    character_class: CharacterClass = dataclasses.field(init=False, repr=False, compare=False)
 
-    @cached_property
-    def gender(self) -> CharacterGender:
-        for aspect in self.iter_aspects(present=True):
-            if aspect.title in ('male', 'female', 'nonbinary'):
-                return CharacterGender(aspect.title)
-        return CharacterGender.UNKNOWN
+    _aspects_by_title: Dict[str, List[CharacterAspect]] = dataclasses.field(init=False, repr=False, compare=False)
 
-    @cached_property
-    def character_class(self) -> CharacterClass:
-        for aspect in self.iter_aspects(present=True):
-            if aspect.title in ('warrior', 'hunter', 'mystic'):
-                return CharacterClass(aspect.title)
-        return CharacterClass.UNKNOWN
+    def __post_init__(self) -> None:
+        aspects_by_title = defaultdict(list)
+        for aspect in self.aspects:
+            aspects_by_title[aspect.title].append(aspect)
+
+        # dataclass is frozen, so regular attribute assignment is not available
+        # (id is interned since it's used as a key all over the chart and graph)
+        object.__setattr__(self, 'id', sys.intern(self.id))
+        object.__setattr__(self, '_aspects_by_title', dict(aspects_by_title))
+        object.__setattr__(self, 'short_id', self.id.split('-', 1)[0])
+
+        gender_title = self._find_present_title(('male', 'female', 'nonbinary'))
+        object.__setattr__(
+            self, 'gender', CharacterGender(gender_title) if gender_title is not None else CharacterGender.UNKNOWN)
+        class_title = self._find_present_title(('warrior', 'hunter', 'mystic'))
+        object.__setattr__(
+            self, 'character_class', CharacterClass(class_title) if class_title is not None else CharacterClass.UNKNOWN)
 
     def iter_aspects(self,
                      legacy: Optional[bool] = None,
@@ -138,6 +147,15 @@ class CharacterData:
                 continue
             yield aspect
 
+    def _find_present_title(self, titles: Iterable[str]) -> Optional[str]:
+        """
+        Finds the first of given aspect titles that the character currently has
+        """
+        for title in titles:
+            if any(not aspect.is_past for aspect in self._aspects_by_title.get(title, ())):
+                return title
+        return None
+
     @classmethod
     def from_entity_dicts(cls: Type[_CharacterData_T],
                           *entity_snapshots: schemas.ProcessedIndividualDict) -> _CharacterData_T:
@@ -177,6 +195,7 @@ class CharacterData:
                     snapshot_id=0,
                 ))
 
+        seen_aspects = {(aspect.title, aspect.data) for aspect in aspects}
         for idx, past_snapshot in enumerate(entity_snapshots[-2::-1]):
             for aspect_data in past_snapshot['status']['aspects']['entries']:
                 past_aspect = CharacterAspect.from_aspect_data(
@@ -185,8 +204,10 @@ class CharacterData:
                     is_past=True,
                     snapshot_id=idx + 1,
                 )
-                if any(a.title == past_aspect.title and a.data == past_aspect.data for a in aspects):
+                aspect_key = (past_aspect.title, past_aspect.data)
+                if aspect_key in seen_aspects:
                     continue
+                seen_aspects.add(aspect_key)
                 aspects.append(past_aspect)
 
         return cls(id=id_, name=name, aspects=aspects)
@@ -4,17 +4,23 @@ from __future__ import annotations
 
 import logging
 import shutil
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict
+from typing import FrozenSet
+from typing import List
 from typing import Optional
 from typing import Set
 from typing import TYPE_CHECKING
+from typing import Tuple
 
 import graphviz
-from PIL import Image
+from graphviz.quoting import attr_list
+from graphviz.quoting import quote
 
 from wildermyth_renderer.character_data import CharacterClass
 from wildermyth_renderer.character_data import CharacterGender
+from wildermyth_renderer.params import RelationshipStatus
 
 if TYPE_CHECKING:
     from wildermyth_renderer.params import RendererParams
@@ -29,6 +35,16 @@ GRAPH_ATTRS = {
     'outputorder': 'nodesfirst',
 }
 
+# charts with more nodes than this are laid out with sfdp unless an engine is specified explicitly,
+# since dot's rank assignment gets very slow on large graphs
+LARGE_GRAPH_NODE_COUNT = 300
+
+LARGE_GRAPH_ENGINE = 'sfdp'
+
+LARGE_GRAPH_ATTRS = {
+    'maxiter': '200',
+}
+
 NODE_SHAPES = {
     CharacterGender.MALE: 'box',
     CharacterGender.FEMALE: 'ellipse',
@@ -43,6 +59,9 @@ NODE_COLORS = {
     CharacterClass.UNKNOWN: 'black',
 }
 
+# image modes that can be stacked as is; anything else (e.g. palette images) is converted to RGB
+STACKABLE_IMAGE_MODES = ('RGB', 'RGBA')
+
 PHANTOM_NODE_ATTRS = {
     'style': 'dotted',
 }
@@ -136,6 +155,35 @@ RELATIONSHIP_EDGES = {
     },
 }
 
+RELATIONSHIP_EDGE_LABEL = '<&nbsp;&nbsp;>'
+
+RELATIONSHIP_GRAPH_EDGE_ATTRS = {
+    'constraint': 'false',
+}
+
+# attributes are formatted only once, so that DOT statements can be written directly
+INVISIBLE_NODE_ATTR_LIST = attr_list(kwargs=INVISIBLE_NODE_ATTRS)
+PARENT_EDGE_ATTR_LIST = attr_list(kwargs=PARENT_EDGE_ATTRS)
+CHILD_EDGE_ATTR_LIST = attr_list(kwargs=CHILD_EGDE_ATTRS)
+RELATIONSHIP_GRAPH_EDGE_ATTR_LIST = attr_list(kwargs=RELATIONSHIP_GRAPH_EDGE_ATTRS)
+RELATIONSHIP_EDGE_ATTR_LISTS = {
+    edge_key: attr_list(kwargs={'label': RELATIONSHIP_EDGE_LABEL, **edge_params['attrs']})
+    for edge_key, edge_params in RELATIONSHIP_EDGES.items()
+}
+
+# (status, type) -> key in RELATIONSHIP_EDGES, so that edge keys don't need to be formatted for every relationship
+RELATIONSHIP_EDGE_KEYS = {
+    (RelationshipStatus[rel_status.upper()], rel_type): edge_key
+    for edge_key in RELATIONSHIP_EDGES
+    for rel_status, _, rel_type in [edge_key.partition('_')]
+    if rel_status != 'unknown'
+}
+
+UNKNOWN_RELATIONSHIP_EDGE_KEYS = {
+    rel_status: f"unknown_{rel_status.name.lower()}"
+    for rel_status in RelationshipStatus
+}
+
 
 class GraphRenderer:
     """
@@ -145,14 +193,20 @@ class GraphRenderer:
     def __init__(self, params: RendererParams, relationship_chart: Optional[RelationshipChart] = None) -> None:
         self.params = params
 
-        self.node_graph = graphviz.Digraph(name='Nodes')
-        self.family_graph = graphviz.Digraph(name='Family')
-        self.relationship_graph = graphviz.Digraph(name='Relationships', edge_attr={'constraint': 'false'})
+        # DOT statements for every part of the graph, they are only put together in make_main_graph
+        self.node_lines: List[str] = []
+        self.family_lines: List[str] = []
+        # relationship edges are grouped by type, so that their attributes are only written once per type
+        self.relationship_lines: Dict[str, List[str]] = {}
 
         self.nodes_in_graph = set()
         self.edge_types_in_graph = set()
 
-        self.children_nodes = defaultdict(set)
+        self.children_nodes: Dict[str, List[str]] = {}
+        self.family_edges_in_graph: Set[Tuple[str, str]] = set()
+
+        self._children_node_ids: Dict[FrozenSet[str], str] = {}
+        self._quoted_ids: Dict[str, str] = {}
 
         if relationship_chart is not None:
             self.add_from_chart(relationship_chart)
@@ -194,37 +248,33 @@ class GraphRenderer:
             attrs.update(PHANTOM_NODE_ATTRS)
             label = f"<<i>{label}</i>>"
 
-        self.node_graph.node(node.id, label, **attrs)
+        self._emit_node(self.node_lines, node.id, attr_list(label, kwargs=attrs))
         self.nodes_in_graph.add(node.id)
 
         if node.parent_ids:
             children_node_id = self._make_children_node_id(node.parent_ids)
             if children_node_id not in self.nodes_in_graph:
-                self.family_graph.node(children_node_id, **INVISIBLE_NODE_ATTRS)
+                self._emit_node(self.family_lines, children_node_id, INVISIBLE_NODE_ATTR_LIST)
                 self.nodes_in_graph.add(children_node_id)
                 for parent_id in node.parent_ids:
-                    self.children_nodes[parent_id].add(children_node_id)
+                    self.children_nodes.setdefault(parent_id, []).append(children_node_id)
                     if parent_id in self.nodes_in_graph:
-                        self.family_graph.edge(parent_id, children_node_id, **PARENT_EDGE_ATTRS)
-            self.family_graph.edge(children_node_id, node.id, **CHILD_EGDE_ATTRS)
+                        self._add_family_edge(parent_id, children_node_id, PARENT_EDGE_ATTR_LIST)
+            self._add_family_edge(children_node_id, node.id, CHILD_EDGE_ATTR_LIST)
 
-        for children_node_id in self.children_nodes[node.id]:
-            self.family_graph.edge(node.id, children_node_id, **PARENT_EDGE_ATTRS)
+        for children_node_id in self.children_nodes.get(node.id, ()):
+            self._add_family_edge(node.id, children_node_id, PARENT_EDGE_ATTR_LIST)
 
-        for (rel_status, rel_type), rel_target_ids in node.relationships.items():
+        for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
             if not rel_target_ids:
                 continue
 
-            edge_key = f"{rel_status.name.lower()}_{rel_type}"
-            if edge_key not in RELATIONSHIP_EDGES:
-                edge_key = f"unknown_{rel_status.name.lower()}"
-            edge_params = RELATIONSHIP_EDGES.get(edge_key, {})
-            edge_attrs = edge_params.get('attrs', {})
+            edge_key = RELATIONSHIP_EDGE_KEYS.get((rel_status, rel_type)) or UNKNOWN_RELATIONSHIP_EDGE_KEYS[rel_status]
             self.edge_types_in_graph.add(edge_key)
 
             for rel_target_id in rel_target_ids:
                 if rel_target_id in self.nodes_in_graph:
-                    self.relationship_graph.edge(node.id, rel_target_id, label='<&nbsp;&nbsp;>', **edge_attrs)
+                    self._emit_edge(self.relationship_lines.setdefault(edge_key, []), node.id, rel_target_id)
 
     def make_legend_graph(self) -> Optional[graphviz.Digraph]:
         """
@@ -290,22 +340,42 @@ class GraphRenderer:
                 'packmode': 'graph' if self.params.pack_by_subgraphs else 'node',
             })
 
+        engine = self.params.engine
+        if engine is None:
+            engine = LARGE_GRAPH_ENGINE if len(self.nodes_in_graph) > LARGE_GRAPH_NODE_COUNT else 'dot'
+            if engine == LARGE_GRAPH_ENGINE:
+                log.info('Chart has more than %d nodes, using %s layout engine', LARGE_GRAPH_NODE_COUNT, engine)
+
+        if engine == LARGE_GRAPH_ENGINE:
+            # applied however the engine was chosen, so the same engine always gives the same layout
+            graph_attrs.update(LARGE_GRAPH_ATTRS)
+
         graph = graphviz.Digraph(
             name=self.params.graph_name,
             format='png',
+            engine=engine,
             directory=self.params.get_render_dir(),
             graph_attr=graph_attrs,
         )
 
+        relationship_lines = [f"edge{RELATIONSHIP_GRAPH_EDGE_ATTR_LIST}"]
+        for edge_key, edge_lines in self.relationship_lines.items():
+            relationship_lines.extend(self._make_block_lines(
+                '', [f"edge{RELATIONSHIP_EDGE_ATTR_LISTS[edge_key]}", *edge_lines]))
+
+        node_block = self._make_block_lines('subgraph Nodes ', self.node_lines)
+        family_block = self._make_block_lines('subgraph Family ', self.family_lines)
+        relationship_block = self._make_block_lines('subgraph Relationships ', relationship_lines)
+
         # order of these parts sometimes seems to affect node placement, so this is left as an option
-        subgraphs = [self.family_graph, self.relationship_graph]
+        blocks = [family_block, relationship_block]
         if self.params.prioritize_relationships:
-            subgraphs.append(self.node_graph)
+            blocks.append(node_block)
         else:
-            subgraphs.insert(0, self.node_graph)
+            blocks.insert(0, node_block)
 
-        for subgraph in subgraphs:
-            graph.subgraph(subgraph)
+        for block in blocks:
+            graph.body.extend(f"\t{line}\n" for line in block)
 
         return graph
 
@@ -314,18 +384,12 @@ class GraphRenderer:
         Renders the full graph (including legend if required) and saves in to output_path specified in renderer params
         """
         tmp_files = []
+        render_dir = self.params.get_render_dir()
 
         main_graph = self.make_main_graph()
-        tmp_files.append(Path(main_graph.filepath))
-
-        if self.params.norender:
-            main_graph.save()
-            render_path = None
-        else:
-            main_graph.render()
-            render_path = Path(f"{main_graph.filepath}.png")
-            tmp_files.append(render_path)
+        tmp_files.append(render_dir / main_graph.filename)
 
+        legend_graph = None
         if self.params.include_legend and self.edge_types_in_graph:
             # after many hours of trying to make it work consistently with legend included as a subgraph
             # and encountering the weirdest assortment of graphviz bugs and quirks in the process,
@@ -333,27 +397,49 @@ class GraphRenderer:
             # is the sanest possible approach
 
             legend_graph = self.make_legend_graph()
-            tmp_files.append(Path(legend_graph.filepath))
+            tmp_files.append(render_dir / legend_graph.filename)
 
-            if self.params.norender:
-                legend_graph.save()
-                legend_render_path = None
-            else:
-                legend_graph.render()
-                legend_render_path = Path(f"{legend_graph.filepath}.png")
+        if self.params.norender:
+            self._save_source(main_graph)
+            if legend_graph is not None:
+                self._save_source(legend_graph)
+            render_path = None
+        else:
+            # every graph is rendered by a separate graphviz process, so there's no reason to wait for them one by one
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                render_futures = [
+                    executor.submit(graph.render)
+                    for graph in (main_graph, legend_graph)
+                    if graph is not None
+                ]
+                for render_future in render_futures:
+                    render_future.result()
+
+            render_path = render_dir / f"{main_graph.filename}.png"
+            tmp_files.append(render_path)
+
+            if legend_graph is not None:
+                # Pillow is only needed for stacking rendered images, so it's not imported unless necessary
+                from PIL import Image
+
+                legend_render_path = render_dir / f"{legend_graph.filename}.png"
                 tmp_files.append(legend_render_path)
 
-                main_image = Image.open(render_path)
-                legend_image = Image.open(legend_render_path)
-                combined_image = Image.new(
-                    'RGB',
-                    (max(main_image.width, legend_image.width), main_image.height + legend_image.height),
-                    color='white',
-                )
-                combined_image.paste(main_image, (0, 0))
-                combined_image.paste(legend_image, (0, main_image.height))
-
-                render_path = self.params.get_render_dir() / f"{main_graph.name}_with_legend.png"
+                with Image.open(render_path) as main_image, Image.open(legend_render_path) as legend_image:
+                    # keep the mode graphviz used when possible to avoid converting the whole image before pasting
+                    if main_image.mode == legend_image.mode and main_image.mode in STACKABLE_IMAGE_MODES:
+                        combined_mode = main_image.mode
+                    else:
+                        combined_mode = 'RGB'
+                    combined_image = Image.new(
+                        combined_mode,
+                        (max(main_image.width, legend_image.width), main_image.height + legend_image.height),
+                        color='white',
+                    )
+                    combined_image.paste(main_image, (0, 0))
+                    combined_image.paste(legend_image, (0, main_image.height))
+
+                render_path = render_dir / f"{main_graph.name}_with_legend.png"
                 combined_image.save(render_path)
 
                 tmp_files.append(render_path)
@@ -370,6 +456,42 @@ class GraphRenderer:
                 if tmp_file is not None and tmp_file != self.params.output_path:
                     tmp_file.unlink(missing_ok=True)
 
-    @classmethod
-    def _make_children_node_id(cls, parent_ids: Set[str]) -> str:
-        return f"children_{'_'.join(sorted(parent_ids))}"
+    def _quote_id(self, node_id: str) -> str:
+        quoted_id = self._quoted_ids.get(node_id)
+        if quoted_id is None:
+            quoted_id = self._quoted_ids[node_id] = quote(node_id)
+        return quoted_id
+
+    def _emit_node(self, lines: List[str], node_id: str, node_attr_list: str) -> None:
+        # same statement as graphviz.Digraph.node would produce
+        lines.append(f"{self._quote_id(node_id)}{node_attr_list}")
+
+    def _emit_edge(self, lines: List[str], tail_id: str, head_id: str, edge_attr_list: str = '') -> None:
+        # same statement as graphviz.Digraph.edge would produce
+        lines.append(f"{self._quote_id(tail_id)} -> {self._quote_id(head_id)}{edge_attr_list}")
+
+    @staticmethod
+    def _make_block_lines(head: str, lines: List[str]) -> List[str]:
+        return [f"{head}{{", *(f"\t{line}" for line in lines), '}']
+
+    @staticmethod
+    def _save_source(graph: graphviz.Digraph) -> None:
+        # graphviz.Digraph.save writes the source line by line, while it's all preformatted already
+        source_path = Path(graph.filepath)
+        source_path.parent.mkdir(parents=True, exist_ok=True)
+        source_path.write_text(graph.source, encoding=graph.encoding)
+
+    def _add_family_edge(self, tail_id: str, head_id: str, edge_attr_list: str) -> None:
+        edge = (tail_id, head_id)
+        if edge in self.family_edges_in_graph:
+            return
+        self.family_edges_in_graph.add(edge)
+        self._emit_edge(self.family_lines, tail_id, head_id, edge_attr_list)
+
+    def _make_children_node_id(self, parent_ids: Set[str]) -> str:
+        # siblings share the same parents, so the id is only built once per family
+        parent_ids = frozenset(parent_ids)
+        children_node_id = self._children_node_ids.get(parent_ids)
+        if children_node_id is None:
+            children_node_id = self._children_node_ids[parent_ids] = f"children_{'_'.join(sorted(parent_ids))}"
+        return children_node_id
@@ -50,6 +50,16 @@ class RendererParams:
     pack_graph: bool = False
     pack_by_subgraphs: bool = False
 
+    # graphviz layout engine for the main graph; if None, it's chosen according to graph size
+    engine: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        # paths are made absolute once here, so that they don't have to be resolved again every time they're used
+        # (dataclass is frozen, so regular attribute assignment is not available)
+        object.__setattr__(self, 'output_path', self.output_path.absolute())
+        if self.render_dir is not None:
+            object.__setattr__(self, 'render_dir', self.render_dir.absolute())
+
     @property
     def graph_name(self) -> str:
         return f"{self.output_path.stem}_graph"
@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 import logging
+from operator import itemgetter
 from typing import Dict
+from typing import Generator
+from typing import Iterable
 from typing import List
 from typing import TYPE_CHECKING
 from typing import Union
@@ -20,15 +23,17 @@ def entity_to_dict(entity: List[Union[str, Dict]]) -> Dict[str, Dict]:
     into a {"id": id, key1: val1, key2: val2, ...} dictionary
     """
 
-    entity_dict = {}
-    for idx in range(0, len(entity), 2):
-        key = 'id' if idx == 0 else entity[idx - 1]
-        value = entity[idx]
+    if not entity:
+        return {}
 
-        assert isinstance(key, str)
-        assert isinstance(value, dict)
+    entity_iter = iter(entity)
+    entity_dict = {'id': next(entity_iter)}
+    entity_dict.update(zip(entity_iter, entity_iter))
 
-        entity_dict[key] = value
+    if __debug__:
+        for key, value in entity_dict.items():
+            assert isinstance(key, str)
+            assert isinstance(value, dict)
     return entity_dict
 
 
@@ -39,8 +44,20 @@ def extract_individual_entities(legacy_dict: schemas.LegacyDict) -> List[List[sc
     :return: List of lists of different character snapshots for each character
     """
 
-    res = []
-    for legacy_entry in legacy_dict['entries']:
+    return list(iter_individual_entities(legacy_dict['entries']))
+
+
+def iter_individual_entities(
+        legacy_entries: Iterable[schemas.EntryDict],
+) -> Generator[List[schemas.ProcessedIndividualDict], None, None]:
+    """
+    Iterates all entities describing individuals from legacy entries;
+    entries are only consumed as needed, so they can be streamed directly from legacy JSON
+    :param legacy_entries: iterable of legacy entries, as found in legacy dictionary
+    :return: iterator of lists of different character snapshots for each character
+    """
+
+    for legacy_entry in legacy_entries:
         if legacy_entry['type'] != 'INDIVIDUAL':
             log.info('Legacy entry %s has type %s, skipping', legacy_entry['id']['value'], legacy_entry['type'])
             continue
@@ -49,18 +66,19 @@ def extract_individual_entities(legacy_dict: schemas.LegacyDict) -> List[List[sc
             log.error('Legacy entry %s has no snapshots, skipping', legacy_entry['id']['value'])
 
         entity_snapshots = []
-        for idx, snapshot in enumerate(sorted(legacy_entry['snapshots'], key=lambda s: s['date'])):
-            try:
-                individual_entity = next(entity for entity in snapshot['entities'] if 'individual' in entity)
-            except StopIteration:
+        for idx, snapshot in enumerate(sorted(legacy_entry['snapshots'], key=itemgetter('date'))):
+            for entity in snapshot['entities']:
+                if 'individual' in entity:
+                    individual_entity = entity
+                    break
+            else:
                 log.error('Legacy entry %s\'s snapshot #%d has no individual entity',
                           legacy_entry['id']['value'], idx + 1)
                 continue
-            else:
-                entity_dict = entity_to_dict(individual_entity)
-                entity_dict['extraLegacyAspects'] = legacy_entry.get('legacyAspects')
-                entity_snapshots.append(entity_dict)
+
+            entity_dict = entity_to_dict(individual_entity)
+            entity_dict['extraLegacyAspects'] = legacy_entry.get('legacyAspects')
+            entity_snapshots.append(entity_dict)
 
         if entity_snapshots:
-            res.append(entity_snapshots)
-    return res
+            yield entity_snapshots
@@ -4,11 +4,14 @@ from __future__ import annotations
 
 import contextlib
 import dataclasses
+import itertools
 import logging
 import re
 import uuid
 from collections import defaultdict
-from copy import deepcopy
+from collections import deque
+from typing import AbstractSet
+from typing import Callable
 from typing import DefaultDict
 from typing import Dict
 from typing import Generator
@@ -30,8 +33,20 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+PAST_RELATIONSHIP_PREFIX = 'relationship_'
+PAST_RELATIONSHIP_RE = re.compile(rf"{PAST_RELATIONSHIP_PREFIX}(.*)_\d+")
 
-@dataclasses.dataclass
+# aspect title -> function that adds the connection described by aspect to chart
+CONNECTION_ASPECT_HANDLERS = {
+    'parentOf': lambda chart, character_id, data: chart.add_child(character_id, data[0]),
+    'childOf': lambda chart, character_id, data: chart.add_child(data[0], character_id),
+    'siblingOf': lambda chart, character_id, data: chart.add_sibling(character_id, data[0]),
+    'lockedRelationship': lambda chart, character_id, data: chart.add_relationship(
+        character_id, data[1], RelationshipStatus.LOCKED, data[0]),
+}
+
+
+@dataclasses.dataclass(eq=False, slots=True)
 class CharacterNode:
     """
     A node representing a single character in a relationship chart
@@ -45,14 +60,45 @@ class CharacterNode:
     child_ids: Set[str] = dataclasses.field(default_factory=set)
     parent_ids: Set[str] = dataclasses.field(default_factory=set)
 
-    relationships: DefaultDict[Tuple[RelationshipStatus, str], Set[str]] = dataclasses.field(
-        default_factory=lambda: defaultdict(set))
+    # relationship type -> relationship status -> target ids; types are on the outside so that filtering by type
+    # can skip whole buckets
+    relationships: Dict[str, Dict[RelationshipStatus, Set[str]]] = dataclasses.field(default_factory=dict)
 
     character_data: Optional[CharacterData] = dataclasses.field(repr=False, default=None)
 
+    def iter_relationship_target_ids(self) -> Generator[Tuple[RelationshipStatus, str, Set[str]], None, None]:
+        for rel_type, rel_status_targets in self.relationships.items():
+            for rel_status, rel_target_ids in rel_status_targets.items():
+                yield rel_status, rel_type, rel_target_ids
+
+    def add_relationship_target(self, rel_status: RelationshipStatus, rel_type: str, target_id: str) -> None:
+        # unlike chained setdefault calls, this doesn't build throwaway containers when the buckets already exist
+        rel_status_targets = self.relationships.get(rel_type)
+        if rel_status_targets is None:
+            self.relationships[rel_type] = {rel_status: {target_id}}
+            return
+
+        rel_target_ids = rel_status_targets.get(rel_status)
+        if rel_target_ids is None:
+            rel_status_targets[rel_status] = {target_id}
+        else:
+            rel_target_ids.add(target_id)
+
+    def remove_relationship_target(self, rel_status: RelationshipStatus, rel_type: str, target_id: str) -> None:
+        rel_status_targets = self.relationships.get(rel_type)
+        if rel_status_targets is None:
+            return
+
+        rel_target_ids = rel_status_targets.get(rel_status)
+        if rel_target_ids is not None:
+            rel_target_ids.discard(target_id)
+
     def __eq__(self, other: CharacterNode) -> bool:
         return self.id == other.id
 
+    def __hash__(self) -> int:
+        return hash(self.id)
+
 
 class MissingNodeError(Exception):
     ...
@@ -80,32 +126,37 @@ class RelationshipChart:
 
     def siblings(self, node: CharacterNode) -> List[CharacterNode]:
         res = []
-        for parent in self.parents(node):
-            for other_child in self.children(parent):
-                if other_child == node or other_child in res:
+        seen_ids = {node.id}
+        for parent_id in node.parent_ids:
+            for other_child_id in self.nodes[parent_id].child_ids:
+                if other_child_id in seen_ids:
                     continue
-                res.append(other_child)
+                seen_ids.add(other_child_id)
+                res.append(self.nodes[other_child_id])
         return res
 
     def iter_relationships(
             self, source: Optional[CharacterNode] = None, target: Optional[CharacterNode] = None,
             rel_status: Optional[RelationshipStatus] = None, rel_type: Optional[str] = None,
     ) -> Generator[Tuple[CharacterNode, CharacterNode, RelationshipStatus, str], None, None]:
-        if source is None:
-            for node in self:
-                yield from self.iter_relationships(node, target, rel_status, rel_type)
-            return
-
-        for (source_rel_status, source_rel_type), source_rel_target_ids in source.relationships.items():
-            if ((rel_status is not None and rel_status != source_rel_status)
-                    or (rel_type is not None and rel_type != source_rel_type)):
+        sources = self.nodes.values() if source is None else (source,)
+        for source in sources:
+            if rel_type is None:
+                source_rel_types = source.relationships.items()
+            elif rel_type in source.relationships:
+                source_rel_types = ((rel_type, source.relationships[rel_type]),)
+            else:
                 continue
-            if target is None:
-                for source_rel_target_id in source_rel_target_ids:
-                    source_rel_target = self.get_node(source_rel_target_id)
-                    yield source, source_rel_target, source_rel_status, source_rel_type
-            elif target.id in source_rel_target_ids:
-                yield source, target, source_rel_status, source_rel_type
+
+            for source_rel_type, source_rel_status_targets in source_rel_types:
+                for source_rel_status, source_rel_target_ids in source_rel_status_targets.items():
+                    if rel_status is not None and rel_status != source_rel_status:
+                        continue
+                    if target is None:
+                        for source_rel_target_id in source_rel_target_ids:
+                            yield source, self.nodes[source_rel_target_id], source_rel_status, source_rel_type
+                    elif target.id in source_rel_target_ids:
+                        yield source, target, source_rel_status, source_rel_type
 
     def make_short_id_lookup(self) -> Dict[str, CharacterNode]:
         res = {}
@@ -119,6 +170,26 @@ class RelationshipChart:
             res[node.label].append(node)
         return res
 
+    def _clone(self: _RelationshipChart_T) -> _RelationshipChart_T:
+        # character data is immutable, so only node containers need to be copied (which is much faster than deepcopy)
+        chart = type(self)()
+        for node_id, node in self.nodes.items():
+            chart.nodes[node_id] = CharacterNode(
+                id=node.id,
+                label=node.label,
+                is_phantom=node.is_phantom,
+                child_ids=set(node.child_ids),
+                parent_ids=set(node.parent_ids),
+                relationships={
+                    rel_type: {
+                        rel_status: set(rel_target_ids) for rel_status, rel_target_ids in rel_status_targets.items()
+                    }
+                    for rel_type, rel_status_targets in node.relationships.items()
+                },
+                character_data=node.character_data,
+            )
+        return chart
+
     def add_node(self, node: CharacterNode) -> None:
         assert node.id not in self.nodes
         self.nodes[node.id] = node
@@ -129,18 +200,19 @@ class RelationshipChart:
         return node
 
     def get_node(self, node_id: str) -> CharacterNode:
-        if node_id not in self.nodes:
-            raise MissingNodeError(node_id)
-        return self.nodes[node_id]
+        try:
+            return self.nodes[node_id]
+        except KeyError:
+            raise MissingNodeError(node_id) from None
 
     def remove_node(self, node_id: str, clear_relations: bool = True) -> None:
         node = self.get_node(node_id)
 
         if clear_relations:
-            for child in self.children(node):
-                child.parent_ids.discard(node_id)
-            for parent in self.parents(node):
-                parent.child_ids.discard(node_id)
+            for child_id in node.child_ids:
+                self.nodes[child_id].parent_ids.discard(node_id)
+            for parent_id in node.parent_ids:
+                self.nodes[parent_id].child_ids.discard(node_id)
             for source, target, rel_status, rel_type in self.iter_relationships(target=node):
                 self.remove_relationship(source.id, node_id, rel_status, rel_type)
 
@@ -181,15 +253,15 @@ class RelationshipChart:
         first_node = self.get_node(first_id)
         second_node = self.get_node(second_id)
 
-        first_node.relationships[rel_status, rel_type].add(second_id)
-        second_node.relationships[rel_status, rel_type].add(first_id)
+        first_node.add_relationship_target(rel_status, rel_type, second_id)
+        second_node.add_relationship_target(rel_status, rel_type, first_id)
 
     def remove_relationship(self, first_id: str, second_id: str, rel_status: RelationshipStatus, rel_type: str) -> None:
         first_node = self.get_node(first_id)
         second_node = self.get_node(second_id)
 
-        first_node.relationships[rel_status, rel_type].discard(second_id)
-        second_node.relationships[rel_status, rel_type].discard(first_id)
+        first_node.remove_relationship_target(rel_status, rel_type, second_id)
+        second_node.remove_relationship_target(rel_status, rel_type, first_id)
 
     def remove_redundant_phantoms(self, clear_relations: bool = True) -> None:
         """
@@ -200,27 +272,27 @@ class RelationshipChart:
             (makes sense to set to False if remove_dead_edges will be called afterwards anyway)
         """
 
-        remove_ids = []
+        remove_ids = set()
         for node in self:
             if not node.is_phantom:
                 continue
 
             if not node.child_ids:
-                remove_ids.append(node.id)
+                remove_ids.add(node.id)
                 continue
 
-            children = self.children(node)
-            child = children[0]
-            for other_parent in self.parents(child):
-                if other_parent != node and not node.child_ids.difference(other_parent.child_ids):
-                    remove_ids.append(node.id)
+            child_id = next(iter(node.child_ids))
+            for other_parent_id in self.nodes[child_id].parent_ids:
+                if other_parent_id != node.id and not node.child_ids.difference(self.nodes[other_parent_id].child_ids):
+                    remove_ids.add(node.id)
                     break
             else:
                 common_phantom_siblings = None
-                for child in children:
+                for child_id in node.child_ids:
                     phantom_siblings = []
-                    for other_parent in self.parents(child):
-                        if other_parent.is_phantom and other_parent != node:
+                    for other_parent_id in self.nodes[child_id].parent_ids:
+                        other_parent = self.nodes[other_parent_id]
+                        if other_parent.is_phantom and other_parent_id != node.id:
                             phantom_siblings.extend(other_parent.child_ids)
                     if common_phantom_siblings is None:
                         common_phantom_siblings = set(phantom_siblings)
@@ -230,19 +302,32 @@ class RelationshipChart:
                     for sibling_id in common_phantom_siblings:
                         self.add_child(node.id, sibling_id, handle_phantoms=False)
 
+        if not remove_ids:
+            return
+
         for remove_id in remove_ids:
-            self.remove_node(remove_id, clear_relations=clear_relations)
+            self.nodes.pop(remove_id)
+        if clear_relations:
+            # a single sweep instead of clearing the connections of every removed phantom separately
+            for node in self:
+                node.parent_ids -= remove_ids
+                node.child_ids -= remove_ids
+                for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                    rel_target_ids -= remove_ids
 
     def remove_dead_edges(self) -> None:
         """
         Remove all connections from all nodes with targets that are not in the chart
         """
 
+        self._remove_dead_edges(frozenset(self.nodes))
+
+    def _remove_dead_edges(self, alive_ids: AbstractSet[str]) -> None:
         for node in self:
-            node.parent_ids.intersection_update(self.nodes.keys())
-            node.child_ids.intersection_update(self.nodes.keys())
-            for rel_target_ids in node.relationships.values():
-                rel_target_ids.intersection_update(self.nodes.keys())
+            node.parent_ids &= alive_ids
+            node.child_ids &= alive_ids
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                rel_target_ids &= alive_ids
 
     def ensure_everything_mutual(self) -> None:
         """
@@ -250,18 +335,35 @@ class RelationshipChart:
         """
 
         for node in self:
-            for child in self.children(node):
-                child.parent_ids.add(node.id)
-            for parent in self.parents(node):
-                parent.child_ids.add(node.id)
+            for child_id in node.child_ids:
+                self.nodes[child_id].parent_ids.add(node.id)
+            for parent_id in node.parent_ids:
+                self.nodes[parent_id].child_ids.add(node.id)
 
-            for rel_source, rel_target, rel_status, rel_type in self.iter_relationships(source=node):
-                rel_target.relationships[rel_status, rel_type].add(node.id)
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                for rel_target_id in rel_target_ids:
+                    self.nodes[rel_target_id].add_relationship_target(rel_status, rel_type, node.id)
 
     def postprocess(self) -> None:
+        """
+        Removes redundant phantoms, then does remove_dead_edges and ensure_everything_mutual in a single pass
+        """
+
         self.remove_redundant_phantoms(clear_relations=False)
-        self.remove_dead_edges()
-        self.ensure_everything_mutual()
+
+        alive_ids = frozenset(self.nodes)
+        for node in self:
+            node.parent_ids &= alive_ids
+            node.child_ids &= alive_ids
+            for child_id in node.child_ids:
+                self.nodes[child_id].parent_ids.add(node.id)
+            for parent_id in node.parent_ids:
+                self.nodes[parent_id].child_ids.add(node.id)
+
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                rel_target_ids &= alive_ids
+                for rel_target_id in rel_target_ids:
+                    self.nodes[rel_target_id].add_relationship_target(rel_status, rel_type, node.id)
 
     def filter_relationships(self: _RelationshipChart_T,
                              allowed_relationships: Optional[Iterable[Tuple[RelationshipStatus, str]]] = None,
@@ -277,26 +379,42 @@ class RelationshipChart:
         """
 
         if not inplace:
-            chart = deepcopy(self)
-            chart.filter_relationships(allowed_relationships, inplace=True)
+            chart = self._clone()
+            chart.filter_relationships(allowed_relationships, disallowed_relationships, inplace=True)
             return chart
 
+        # statuses with wildcard types are kept separately, so every check is one lookup by status and one by pair;
+        # if there are no wildcards among allowed relationships, all the other types can be skipped entirely
+        allowed_types = None
+        allowed_wildcard_statuses = set()
         if allowed_relationships is not None:
             allowed_relationships = set(allowed_relationships)
+            allowed_wildcard_statuses = {
+                rel_status for rel_status, rel_type in allowed_relationships if rel_type == '*'
+            }
+            if not allowed_wildcard_statuses:
+                allowed_types = {rel_type for _, rel_type in allowed_relationships}
+        disallowed_wildcard_statuses = set()
         if disallowed_relationships is not None:
             disallowed_relationships = set(disallowed_relationships)
+            disallowed_wildcard_statuses = {
+                rel_status for rel_status, rel_type in disallowed_relationships if rel_type == '*'
+            }
+        else:
+            disallowed_relationships = set()
 
         for node in self:
             new_relationships = {}
-            for (rel_status, rel_type), rel_targets in node.relationships.items():
-                if (disallowed_relationships is not None
-                        and ((rel_status, rel_type) in disallowed_relationships
-                             or (rel_status, '*') in disallowed_relationships)):
+            for rel_type, rel_status_targets in node.relationships.items():
+                if allowed_types is not None and rel_type not in allowed_types:
                     continue
-                if (allowed_relationships is None
-                        or (rel_status, rel_type) in allowed_relationships
-                        or (rel_status, '*') in allowed_relationships):
-                    new_relationships[rel_status, rel_type] = rel_targets
+                for rel_status, rel_targets in rel_status_targets.items():
+                    if rel_status in disallowed_wildcard_statuses or (rel_status, rel_type) in disallowed_relationships:
+                        continue
+                    if (allowed_relationships is None
+                            or rel_status in allowed_wildcard_statuses
+                            or (rel_status, rel_type) in allowed_relationships):
+                        new_relationships.setdefault(rel_type, {})[rel_status] = rel_targets
             node.relationships = new_relationships
         return None
 
@@ -311,43 +429,46 @@ class RelationshipChart:
         :param exclude_ids: if not None, any nodes in this list will be removed (even if present in anchor_ids)
             and their relations will not be processed
         :param clear_relations: whether to remove all connections with removed nodes from other nodes
+            and then remove phantoms made redundant by the trim
             (makes sense to set to False if remove_dead_edges will be called afterwards anyway)
         :param inplace: if False, a new copy of this chart will be created for these changes
         :return: None if inplace is True, else newly created chart
         """
 
         if not inplace:
-            chart = deepcopy(self)
-            chart.trim(anchor_ids, inplace=True)
+            chart = self._clone()
+            chart.trim(anchor_ids, exclude_ids, clear_relations=clear_relations, inplace=True)
             return chart
 
         anchor_ids = set(anchor_ids) if anchor_ids is not None else set(self.nodes.keys())
         exclude_ids = set(exclude_ids) if exclude_ids is not None else set()
 
-        def _get_related_nodes(current_node_ids: Set[str], res_set: Set[str]) -> Set[str]:
-            res_set.update(current_node_ids)
-            new_node_ids = set()
-            for current_node_id in current_node_ids:
-                current_node = self.get_node(current_node_id)
-                new_node_ids.update(current_node.parent_ids)
-                new_node_ids.update(current_node.child_ids)
-            new_node_ids.difference_update(res_set)
-            new_node_ids.difference_update(exclude_ids)
-            if not new_node_ids:
-                return res_set
-            return _get_related_nodes(new_node_ids, res_set)
-
-        related_nodes = _get_related_nodes(anchor_ids, set())
-        for node_id in anchor_ids.difference(exclude_ids):
-            node = self.get_node(node_id)
-            for rel_target_ids in node.relationships.values():
+        anchor_ids.difference_update(exclude_ids)
+        for node_id in anchor_ids:
+            # fail early for unknown anchors, all the other nodes are reached through existing connections
+            self.get_node(node_id)
+
+        # breadth-first search through family connections
+        related_nodes = set(anchor_ids)
+        frontier = deque(anchor_ids)
+        while frontier:
+            current_node = self.nodes[frontier.popleft()]
+            for related_id in itertools.chain(current_node.parent_ids, current_node.child_ids):
+                if related_id not in related_nodes and related_id not in exclude_ids:
+                    related_nodes.add(related_id)
+                    frontier.append(related_id)
+
+        for node_id in anchor_ids:
+            node = self.nodes[node_id]
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
                 rel_target_ids = rel_target_ids.difference(exclude_ids)
                 related_nodes.update(rel_target_ids)
 
         self.nodes = {k: v for k, v in self.nodes.items() if k in related_nodes}
         if clear_relations:
-            self.remove_redundant_phantoms(clear_relations=False)
-            self.remove_dead_edges()
+            # dead edges have to go first, phantom checks expect all family connections to point to existing nodes
+            self._remove_dead_edges(related_nodes)
+            self.remove_redundant_phantoms()
         return None
 
     def apply_filter_params(self: _RelationshipChart_T,
@@ -361,7 +482,7 @@ class RelationshipChart:
         """
 
         if not inplace:
-            chart = deepcopy(self)
+            chart = self._clone()
             chart.apply_filter_params(params, inplace=True)
             return chart
 
@@ -369,10 +490,11 @@ class RelationshipChart:
             self.filter_relationships(params.include_relationships, params.exclude_relationships, inplace=True)
 
         if params.include_heroes is not None or params.exclude_heroes is not None:
-            self.trim(params.include_heroes, params.exclude_heroes, clear_relations=False, inplace=True)
-
-        self.remove_redundant_phantoms()
-        self.remove_dead_edges()
+            # trim already leaves the chart without dead edges and redundant phantoms
+            self.trim(params.include_heroes, params.exclude_heroes, inplace=True)
+        else:
+            self.remove_dead_edges()
+            self.remove_redundant_phantoms()
         return None
 
     def clean_relationships(self: _RelationshipChart_T, inplace: bool = False) -> Optional[_RelationshipChart_T]:
@@ -383,21 +505,31 @@ class RelationshipChart:
         """
 
         if not inplace:
-            chart = deepcopy(self)
+            chart = self._clone()
             chart.clean_relationships(inplace=True)
             return chart
 
+        # relationships are mutual, so every pair is only looked at from the side with the smaller id
+        best_status_dict = {}
+        for node in self:
+            node_id = node.id
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                for rel_target_id in rel_target_ids:
+                    if rel_target_id < node_id:
+                        continue
+                    status_dict_key = (node_id, rel_target_id, rel_type)
+                    prev_status = best_status_dict.get(status_dict_key)
+                    if prev_status is None or prev_status < rel_status:
+                        best_status_dict[status_dict_key] = rel_status
+
         remove_relationships = []
-        rel_status_dict = {}
-        for rel_source, rel_target, rel_status, rel_type in self.iter_relationships():
-            status_dict_key = (*sorted((rel_source.id, rel_target.id)), rel_type)
-            if (prev_status := rel_status_dict.get(status_dict_key)) is not None:
-                worse_status, better_status = sorted((rel_status, prev_status))
-                if worse_status != better_status:
-                    remove_relationships.append((rel_source.id, rel_target.id, worse_status, rel_type))
-                    rel_status_dict[status_dict_key] = better_status
-            else:
-                rel_status_dict[status_dict_key] = rel_status
+        for node in self:
+            node_id = node.id
+            for rel_status, rel_type, rel_target_ids in node.iter_relationship_target_ids():
+                for rel_target_id in rel_target_ids:
+                    if (rel_target_id >= node_id
+                            and best_status_dict[node_id, rel_target_id, rel_type] != rel_status):
+                        remove_relationships.append((node_id, rel_target_id, rel_status, rel_type))
 
         for rel_data in remove_relationships:
             self.remove_relationship(*rel_data)
@@ -405,46 +537,67 @@ class RelationshipChart:
 
     @classmethod
     def from_node_list(cls: Type[_RelationshipChart_T], nodes: List[CharacterNode]) -> _RelationshipChart_T:
-        res = cls()
-        for node in nodes:
-            res.add_node(node)
+        res = cls(nodes={node.id: node for node in nodes})
+        # same check add_node does, but once for the whole list
+        assert len(res.nodes) == len(nodes)
         return res
 
     @classmethod
     def from_character_data(cls: Type[_RelationshipChart_T],
                             characters: List[CharacterData],
-                            postprocess: bool = True) -> _RelationshipChart_T:
+                            postprocess: bool = True,
+                            keep: Optional[Callable[[str], bool]] = None) -> _RelationshipChart_T:
         """
         Creates a RelationshipChart instance from a list of characters
         :param characters: list of CharacterData instances representing characters in the chart
         :param postprocess: whether to cleanup the chart after creation
             (currently there's no reason not to, unless more nodes/relationships are to be added manually later)
+        :param keep: if not None, only characters whose ids satisfy this predicate will be added to the chart,
+            and all connections to other characters will be dropped; characters that are siblings only through
+            a dropped parent are not connected through a phantom parent instead
         :return: created RelationshipChart instance
         """
 
+        # character id -> ids of its parents that were dropped by keep
+        dropped_parent_ids = {}
+        if keep is not None:
+            kept_characters = []
+            dropped_ids = set()
+            for cdata in characters:
+                if keep(cdata.id):
+                    kept_characters.append(cdata)
+                else:
+                    dropped_ids.add(cdata.id)
+                    for aspect in cdata.aspects:
+                        if aspect.title == 'parentOf':
+                            dropped_parent_ids.setdefault(aspect.data[0], set()).add(cdata.id)
+            for cdata in kept_characters:
+                for aspect in cdata.aspects:
+                    if aspect.title == 'childOf' and aspect.data[0] in dropped_ids:
+                        dropped_parent_ids.setdefault(cdata.id, set()).add(aspect.data[0])
+            characters = kept_characters
+
         chart = cls.from_node_list([
             CharacterNode(id=cdata.id, label=cdata.name, character_data=cdata)
             for cdata in characters
         ])
 
-        past_relationship_re = re.compile(r'relationship_(.*)_\d+')
-
         for character_data in characters:
-            for aspect in character_data.iter_aspects():
+            character_id = character_data.id
+            # no filters are needed here, so aspects are read directly instead of going through iter_aspects
+            for aspect in character_data.aspects:
+                title = aspect.title
+                if (title == 'siblingOf'
+                        and (own_dropped_parent_ids := dropped_parent_ids.get(character_id)) is not None
+                        and not own_dropped_parent_ids.isdisjoint(dropped_parent_ids.get(aspect.data[0], ()))):
+                    # the shared parent was dropped, so a phantom standing in for it would leak its relations
+                    continue
                 with contextlib.suppress(MissingNodeError):
-                    if aspect.title == 'parentOf':
-                        chart.add_child(character_data.id, aspect.data[0])
-                    elif aspect.title == 'childOf':
-                        chart.add_child(aspect.data[0], character_data.id)
-                    elif aspect.title == 'siblingOf':
-                        chart.add_sibling(character_data.id, aspect.data[0])
-
-                    elif aspect.title == 'lockedRelationship':
-                        chart.add_relationship(
-                            character_data.id, aspect.data[1], RelationshipStatus.LOCKED, aspect.data[0])
-                    elif (match := past_relationship_re.fullmatch(aspect.title)) is not None:
-                        chart.add_relationship(
-                            character_data.id, aspect.data[0], RelationshipStatus.PAST, match.group(1))
+                    if (handler := CONNECTION_ASPECT_HANDLERS.get(title)) is not None:
+                        handler(chart, character_id, aspect.data)
+                    elif (title.startswith(PAST_RELATIONSHIP_PREFIX)
+                          and (match := PAST_RELATIONSHIP_RE.fullmatch(title)) is not None):
+                        chart.add_relationship(character_id, aspect.data[0], RelationshipStatus.PAST, match.group(1))
 
         if postprocess:
             chart.postprocess()